@@ -6,82 +6,206 @@ This script processes .eml files and sets their file system modification time
 to match the date found in the email's Date header.
 """
 
+import io
 import os
 import sys
 import re
+import fnmatch
+import mmap
 import argparse
-from datetime import datetime
-from email import message_from_file
-from email.utils import parsedate_to_datetime
-import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime, parsedate_tz, mktime_tz
 
-def extract_date_from_eml(file_path):
+# Trailing timezone patterns stripped by parse_date_manually
+_RE_PAREN_TZ = re.compile(r'\s*\([^)]+\)\s*$')                      # (timezone name)
+_RE_NUMERIC_TZ = re.compile(r'\s*[+-]\d{4}\s*$')                     # +0100, -0500
+_RE_NAMED_TZ = re.compile(r'\s*(GMT|UTC|CET|EST|PST|MST|CST)\s*$')    # timezone names
+
+# Number of bytes at the start of a file searched for the Date header, and
+# the larger window used once if the headers run past it
+_HEADER_WINDOW = 8192
+_HEADER_LIMIT = 1 << 20
+
+# Returned by _scan_date_header when the window ends inside the headers
+_NEED_MORE = object()
+
+# strptime formats tried by parse_date_manually, most common first
+_PRIMARY_FORMATS = (
+    '%a, %d %b %Y %H:%M:%S %z',        # Tue, 5 Mar 2024 16:01:44 +0100
+    '%a, %d %b %Y %H:%M:%S %Z',        # Tue, 5 Mar 2024 16:01:44 CET
+    '%d %b %Y %H:%M:%S %z',            # 5 Mar 2024 16:01:44 +0100
+    '%a, %d %b %Y %H:%M:%S',           # Tue, 5 Mar 2024 16:01:44 (no timezone)
+    '%d %b %Y %H:%M:%S',               # 5 Mar 2024 16:01:44
+    '%Y-%m-%d %H:%M:%S',               # 2024-03-05 16:01:44
+    '%a %b %d %H:%M:%S %Y',            # Tue Mar 5 16:01:44 2024
+    '%a %b %d %H:%M:%S %Z %Y',         # Tue Mar 5 16:01:44 CET 2024
+)
+
+# Formats retried once timezone info has been stripped
+_FALLBACK_FORMATS = (
+    '%a, %d %b %Y %H:%M:%S',
+    '%d %b %Y %H:%M:%S',
+    '%a %b %d %H:%M:%S %Y',
+)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def emit(out, message, flush=False):
+    """
+    Write a line of output.
+    
+    Args:
+        out (io.BufferedWriter): Binary writer, or None to use print()
+        message (str): Line to write, without trailing newline
+        flush (bool): If True, flush the writer after this line (for errors)
+    """
+    if out is None:
+        print(message)
+        return
+    
+    # Encode like print() would, so undecodable file names (surrogate
+    # escapes) and PYTHONIOENCODING are honoured
+    line = message + '\n'
+    encoding = sys.stdout.encoding or 'utf-8'
+    try:
+        data = line.encode(encoding, sys.stdout.errors or 'strict')
+    except UnicodeEncodeError:
+        data = line.encode(encoding, 'backslashreplace')
+    out.write(data)
+    if flush:
+        out.flush()
+
+def _scan_date_header(head, truncated):
+    """
+    Find the Date header value in the leading bytes of a message.
+    
+    Args:
+        head (bytes): Leading bytes of the file
+        truncated (bool): True if the file continues past head
+        
+    Returns:
+        str: Unfolded Date header value, None if there is no Date header, or
+        _NEED_MORE if head ends before the answer is known
+    """
+    header_end = -1
+    for blank in (b'\n\n', b'\n\r\n'):
+        pos = head.find(blank)
+        if pos >= 0 and (header_end < 0 or pos < header_end):
+            header_end = pos
+    
+    # Find the Date header (case insensitive) within the header block
+    lower = head.lower()
+    if lower.startswith(b'date:'):
+        start = 5
+    else:
+        start = lower.find(b'\ndate:')
+        if start >= 0:
+            start += 6
+    
+    if start < 0 or 0 <= header_end < start:
+        if truncated and header_end < 0:
+            return _NEED_MORE  # Still inside the headers
+        return None
+    
+    # Extend over folded continuation lines
+    end = head.find(b'\n', start)
+    while end >= 0 and head[end + 1:end + 2] in (b' ', b'\t'):
+        end = head.find(b'\n', end + 1)
+    if end < 0 or end + 1 == len(head):
+        if truncated:
+            return _NEED_MORE  # Don't parse a value cut off by the window
+        end = len(head)
+    
+    return b' '.join(head[start:end].split()).decode('ascii', 'ignore')
+
+def read_date_header(file_path):
+    """
+    Read the raw Date header value from the start of a file. Only the first
+    _HEADER_WINDOW bytes are mapped, or _HEADER_LIMIT bytes when the headers
+    are longer, so the message body is not read and the work stays bounded
+    however long the lines are.
+    
+    Args:
+        file_path (str): Path to the .eml file
+        
+    Returns:
+        str: Unfolded Date header value, or None if there is no Date header
+    """
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        file_size = os.fstat(fd).st_size
+        # Try the small window first, then the whole limit in one step, so
+        # long headers are scanned at most twice rather than once per growth
+        for window in (_HEADER_WINDOW, _HEADER_LIMIT):
+            size = min(window, file_size)
+            if size == 0:
+                return None
+            with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as mm:
+                head = mm[:size]
+            value = _scan_date_header(head, file_size > size)
+            if value is not _NEED_MORE:
+                return value
+    finally:
+        os.close(fd)
+    
+    return None  # Headers run past _HEADER_LIMIT
+
+def extract_date_from_eml(file_path, out=None):
     """
     Extract the date from an .eml file's Date header.
     
     Args:
         file_path (str): Path to the .eml file
+        out (io.BufferedWriter): Writer for error messages, see emit
         
     Returns:
         datetime: Parsed datetime object, or None if parsing fails
     """
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            # Try to parse as proper email message
-            msg = message_from_file(f)
-            date_header = msg.get('Date')
-            
-            if date_header:
-                try:
-                    # Use email.utils to parse the date
-                    return parsedate_to_datetime(date_header)
-                except (ValueError, TypeError):
-                    # If email.utils fails, try manual parsing
-                    pass
-            
-        # Fallback: manual header parsing for malformed emails
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            for line_num, line in enumerate(f):
-                if line_num > 50:  # Only check first 50 lines
-                    break
-                    
-                # Look for Date: header (case insensitive)
-                if line.lower().startswith('date:'):
-                    date_str = line[5:].strip()
-                    return parse_date_manually(date_str)
-                    
-                # Stop at empty line (end of headers)
-                if line.strip() == '':
-                    break
+        date_header = read_date_header(file_path)
+        
+        if date_header:
+            try:
+                # Use email.utils to parse the date
+                return parsedate_to_datetime(date_header)
+            except (ValueError, TypeError):
+                # If email.utils fails, try manual parsing of the same value
+                return parse_date_manually(date_header, tokenize=False)
                     
     except Exception as e:
-        print(f"Error reading {file_path}: {e}")
+        emit(out, f"Error reading {file_path}: {e}", flush=True)
     
     return None
 
-def parse_date_manually(date_str):
+def parse_date_manually(date_str, tokenize=True):
     """
     Manually parse various date formats found in email headers.
     
     Args:
         date_str (str): Date string from email header
+        tokenize (bool): If False, skip the email.utils pass (for callers
+            that have already tried parsedate_to_datetime)
         
     Returns:
         datetime: Parsed datetime object, or None if parsing fails
     """
-    # Common email date formats
-    formats = [
-        '%a, %d %b %Y %H:%M:%S %z',        # Tue, 5 Mar 2024 16:01:44 +0100
-        '%a, %d %b %Y %H:%M:%S %Z',        # Tue, 5 Mar 2024 16:01:44 CET
-        '%d %b %Y %H:%M:%S %z',            # 5 Mar 2024 16:01:44 +0100
-        '%a, %d %b %Y %H:%M:%S',           # Tue, 5 Mar 2024 16:01:44 (no timezone)
-        '%d %b %Y %H:%M:%S',               # 5 Mar 2024 16:01:44
-        '%Y-%m-%d %H:%M:%S',               # 2024-03-05 16:01:44
-        '%a %b %d %H:%M:%S %Y',            # Tue Mar 5 16:01:44 2024
-        '%a %b %d %H:%M:%S %Z %Y',         # Tue Mar 5 16:01:44 CET 2024
-    ]
-    
-    for fmt in formats:
+    # For direct calls: email.utils' tokenizer copes with most RFC 822/2822
+    # variants, including zone names such as EST, in one pass. A missing zone
+    # comes back as offset 0 (UTC). extract_date_from_eml skips this, since
+    # parsedate_to_datetime has already rejected anything it would accept.
+    tt = parsedate_tz(date_str) if tokenize else None
+    if tt is not None and abs(tt[9]) < 86400:
+        try:
+            # Validate the fields first: mktime_tz would silently roll
+            # 30 Feb or 25:61 over into the next month or day
+            datetime(*tt[:6])
+            return datetime.fromtimestamp(mktime_tz(tt), tz=timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            pass
+    
+    # Other email date formats
+    for fmt in _PRIMARY_FORMATS:
         try:
             return datetime.strptime(date_str, fmt)
         except ValueError:
@@ -89,11 +213,11 @@ def parse_date_manually(date_str):
     
     # Try removing timezone info and parsing again
     # Remove common timezone patterns
-    date_clean = re.sub(r'\s*\([^)]+\)\s*$', '', date_str)  # Remove (timezone name)
-    date_clean = re.sub(r'\s*[+-]\d{4}\s*$', '', date_clean)  # Remove +0100, -0500
-    date_clean = re.sub(r'\s*(GMT|UTC|CET|EST|PST|MST|CST)\s*$', '', date_clean)  # Remove timezone names
+    date_clean = _RE_PAREN_TZ.sub('', date_str)  # Remove (timezone name)
+    date_clean = _RE_NUMERIC_TZ.sub('', date_clean)  # Remove +0100, -0500
+    date_clean = _RE_NAMED_TZ.sub('', date_clean)  # Remove timezone names
     
-    for fmt in ['%a, %d %b %Y %H:%M:%S', '%d %b %Y %H:%M:%S', '%a %b %d %H:%M:%S %Y']:
+    for fmt in _FALLBACK_FORMATS:
         try:
             return datetime.strptime(date_clean.strip(), fmt)
         except ValueError:
@@ -101,36 +225,39 @@ def parse_date_manually(date_str):
     
     return None
 
-def set_file_date(file_path, dt):
+def set_file_date(file_path, dt, out=None):
     """
-    Set the modification time of a file using touch command.
+    Set the access and modification times of a file.
     
     Args:
         file_path (str): Path to the file
-        dt (datetime): Datetime to set
+        dt (datetime): Datetime to set (naive values are taken as UTC)
+        out (io.BufferedWriter): Writer for error messages, see emit
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        # Format datetime for touch command: YYYYMMDDHHMM.SS
-        timestamp = dt.strftime('%Y%m%d%H%M.%S')
+        if dt.tzinfo is None:
+            # A Date header without a timezone is ambiguous; assume UTC
+            dt = dt.replace(tzinfo=timezone.utc)
         
-        # Use touch command to set the file date
-        result = subprocess.run(['touch', '-t', timestamp, file_path], 
-                              capture_output=True, text=True)
+        # Integer nanoseconds keep sub-second precision without a float
+        # round-trip
+        delta = dt - _EPOCH
+        epoch_ns = ((delta.days * 86400 + delta.seconds) * 1_000_000
+                    + delta.microseconds) * 1000
         
-        if result.returncode == 0:
-            return True
-        else:
-            print(f"Error setting date for {file_path}: {result.stderr}")
-            return False
+        # A single utimensat(2) per file; io_uring has no utimensat opcode,
+        # so there is no batched submission path to use instead
+        os.utime(file_path, ns=(epoch_ns, epoch_ns))
+        return True
             
     except Exception as e:
-        print(f"Error setting date for {file_path}: {e}")
+        emit(out, f"Error setting date for {file_path}: {e}", flush=True)
         return False
 
-def process_eml_file(file_path, dry_run=False, verbose=False):
+def process_eml_file(file_path, dry_run=False, verbose=False, out=None):
     """
     Process a single .eml file to set its date.
     
@@ -138,37 +265,87 @@ def process_eml_file(file_path, dry_run=False, verbose=False):
         file_path (str): Path to the .eml file
         dry_run (bool): If True, don't actually modify files
         verbose (bool): If True, print detailed information
+        out (io.BufferedWriter): Writer for output, see emit
         
     Returns:
         bool: True if successful, False otherwise
     """
-    if not os.path.isfile(file_path):
-        print(f"File not found: {file_path}")
-        return False
+    # No isfile() check: callers pass paths already known to be files, and
+    # a missing file is reported by extract_date_from_eml
+    base = os.path.basename(file_path)
     
     # Extract date from email
-    dt = extract_date_from_eml(file_path)
+    dt = extract_date_from_eml(file_path, out)
     
     if dt is None:
         if verbose:
-            print(f"❌ Could not extract date from: {os.path.basename(file_path)}")
+            emit(out, f"❌ Could not extract date from: {base}")
         return False
     
     if dry_run:
-        print(f"🔍 Would set {os.path.basename(file_path)} to: {dt.strftime('%Y-%m-%d %H:%M:%S')}")
+        emit(out, f"🔍 Would set {base} to: {dt.strftime('%Y-%m-%d %H:%M:%S')}")
         return True
     
     # Set the file date
-    success = set_file_date(file_path, dt)
+    success = set_file_date(file_path, dt, out)
     
     if success:
         if verbose:
-            print(f"✅ Set {os.path.basename(file_path)} to: {dt.strftime('%Y-%m-%d %H:%M:%S')}")
+            emit(out, f"✅ Set {base} to: {dt.strftime('%Y-%m-%d %H:%M:%S')}")
     else:
-        print(f"❌ Failed to set date for: {os.path.basename(file_path)}")
+        emit(out, f"❌ Failed to set date for: {base}", flush=True)
     
     return success
 
+def make_name_matcher(pattern):
+    """
+    Build a case-insensitive file name predicate for a shell pattern.
+    
+    Args:
+        pattern (str): Shell pattern for file names, e.g. '*.eml'
+        
+    Returns:
+        callable: Function taking a file name and returning True if it matches
+    """
+    if pattern.lower() == '*.eml':
+        # Default pattern: a suffix test is enough
+        return lambda name: name.lower().endswith('.eml')
+    
+    regex = re.compile(fnmatch.translate(pattern.lower()))
+    return lambda name: regex.match(name.lower()) is not None
+
+def iter_emls(path, recursive, match):
+    """
+    Yield the paths of files in a directory whose names match a predicate.
+    
+    Args:
+        path (str): Directory to scan
+        recursive (bool): If True, descend into subdirectories
+        match (callable): File name predicate, see make_name_matcher
+        
+    Yields:
+        str: Path of each matching file
+    """
+    # Unreadable directories and entries are skipped, as os.walk does
+    try:
+        it = os.scandir(path)
+    except OSError:
+        return
+    
+    with it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                is_file = not is_dir and entry.is_file()
+            except OSError:
+                continue
+            
+            if is_dir:
+                if recursive:
+                    yield from iter_emls(entry.path, recursive, match)
+            elif is_file and match(entry.name):
+                yield entry.path
+
 def main():
     parser = argparse.ArgumentParser(description='Set .eml file dates based on email Date header')
     parser.add_argument('path', nargs='?', default='.', 
@@ -190,35 +367,18 @@ def main():
         print(f"Error: Path does not exist: {path}")
         sys.exit(1)
     
-    files_to_process = []
-    
     if os.path.isfile(path):
         if path.lower().endswith('.eml'):
-            files_to_process.append(path)
+            files_to_process = [path]
         else:
             print(f"Error: File is not a .eml file: {path}")
             sys.exit(1)
     else:
-        # Directory processing
-        import fnmatch
-        
-        if args.recursive:
-            for root, dirs, files in os.walk(path):
-                for filename in files:
-                    if fnmatch.fnmatch(filename.lower(), args.pattern.lower()):
-                        files_to_process.append(os.path.join(root, filename))
-        else:
-            for filename in os.listdir(path):
-                if fnmatch.fnmatch(filename.lower(), args.pattern.lower()):
-                    file_path = os.path.join(path, filename)
-                    if os.path.isfile(file_path):
-                        files_to_process.append(file_path)
+        # Directory processing: files are handed to the workers as they are
+        # found, so scanning overlaps with processing
+        files_to_process = iter_emls(path, args.recursive, make_name_matcher(args.pattern))
     
-    if not files_to_process:
-        print(f"No .eml files found in: {path}")
-        sys.exit(0)
-    
-    print(f"Found {len(files_to_process)} .eml file(s) to process")
+    print(f"Processing .eml file(s) in: {path}")
     
     if args.dry_run:
         print("🔍 DRY RUN MODE - No files will be modified")
@@ -226,16 +386,58 @@ def main():
     success_count = 0
     fail_count = 0
     
-    for file_path in files_to_process:
-        if process_eml_file(file_path, args.dry_run, args.verbose):
-            success_count += 1
-        else:
-            fail_count += 1
+    def tally(futures):
+        nonlocal success_count, fail_count
+        for future in futures:
+            file_path = pending.pop(future)
+            try:
+                success = future.result()
+            except Exception as e:
+                # One bad file must not abort the whole run
+                emit(out, f"Error processing {file_path}: {e}", flush=True)
+                success = False
+            if success:
+                success_count += 1
+            else:
+                fail_count += 1
+    
+    # Each file is independent and the work is I/O-bound, so threads overlap
+    # the reads and metadata updates
+    max_workers = min(32, (os.cpu_count() or 4) * 4)
+    # Bound the number of queued files so a huge tree isn't all held in memory
+    max_pending = max_workers * 4
+    
+    # Per-file lines go through one large buffer instead of a print() each.
+    # It wraps the raw stream so that flushing it reaches the fd directly
+    # (sys.stdout.buffer is already raw when Python runs unbuffered).
+    sys.stdout.flush()
+    raw = getattr(sys.stdout.buffer, 'raw', sys.stdout.buffer)
+    out = io.BufferedWriter(raw, buffer_size=1 << 16)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}  # future -> file path
+            for file_path in files_to_process:
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    tally(done)
+                future = executor.submit(
+                    process_eml_file, file_path, args.dry_run, args.verbose, out)
+                pending[future] = file_path
+            
+            tally(as_completed(list(pending)))
+    finally:
+        out.flush()
+        out.detach()  # Leave sys.stdout's raw stream open
+    
+    total = success_count + fail_count
+    if total == 0:
+        print(f"No .eml files found in: {path}")
+        sys.exit(0)
     
     print(f"\n📊 Summary:")
     print(f"✅ Successfully processed: {success_count}")
     print(f"❌ Failed: {fail_count}")
-    print(f"📄 Total files: {len(files_to_process)}")
+    print(f"📄 Total files: {total}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file